@@ -1,10 +1,11 @@
+import os
 import streamlit as st
 import pandas as pd
 import numpy as np
+import pyarrow as pa
+import pyarrow.csv as pacsv
 import plotly.express as px
-from streamlit_folium import st_folium
-import folium
-from folium.plugins import MarkerCluster, Fullscreen
+import plotly.graph_objects as go
 
 # -------------------------------
 # Page setup
@@ -21,47 +22,289 @@ st.caption(
     "Explore complaint types, resolution times, and closure rates by day and hour — powered by a compressed local dataset."
 )
 
+# -------------------------------
+# Shared constants
+# -------------------------------
+# Warm palette for bar charts
+WARM = ["#8B0000","#B22222","#DC143C","#FF4500","#FF7F50","#FFA500","#FFB347","#FFD580"]
+
+ORDER_DAYS = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
+
+# Simple status→color legend for the map
+STATUS_COLORS = {
+    "Closed": "#2E7D32",          # green
+    "In Progress": "#1E88E5",     # blue
+    "Open": "#FB8C00",            # orange
+    "Assigned": "#8E24AA",        # purple
+    "Pending": "#F4511E",         # deep orange
+    "Started": "#3949AB",         # indigo
+    "Unspecified": "#9E9E9E",     # grey
+}
+
 # -------------------------------
 # Data loader (robust)
 # -------------------------------
-@st.cache_data(show_spinner=True)
+# Only the columns the app actually uses are read from disk
+LOAD_COLS = [
+    "created_date", "closed_date", "complaint_type",
+    "status", "borough", "latitude", "longitude",
+]
+
+LABEL_COLS = ["status", "complaint_type", "borough"]
+
+# Bump when the cached layout or derived columns change so old caches are rebuilt
+CACHE_VERSION = 2
+
+def add_derived_columns(df):
+    # Labels as categoricals: Feather stores them dictionary-encoded and they read
+    # back as categoricals, so warm starts never materialize per-row strings
+    for col in LABEL_COLS:
+        if col in df:
+            df[col] = df[col].fillna("Unspecified").astype("category")
+
+    # Derived fields, computed on raw datetime64 arrays rather than .dt accessors
+    if {"created_date", "closed_date"}.issubset(df.columns):
+        delta = df["closed_date"].to_numpy() - df["created_date"].to_numpy()
+        df["hours_to_close"] = delta / np.timedelta64(1, "h")
+
+    if "created_date" in df:
+        valid = df["created_date"].notna().to_numpy()
+        hours_since_epoch = df["created_date"].to_numpy().astype("datetime64[h]").astype("int64")
+        df["hour"] = np.where(valid, hours_since_epoch % 24, np.nan)
+        # 1970-01-01 was a Thursday (Monday = 0); NaT rows get code -1
+        dow = np.where(valid, (hours_since_epoch // 24 + 3) % 7, -1).astype("int8")
+        df["day_of_week"] = pd.Categorical.from_codes(dow, categories=ORDER_DAYS, ordered=True)
+        # Packed (weekday, hour) bin 0..167 for the heatmap histogram; -1 for NaT
+        df["dh_bin"] = np.where(valid, dow.astype(np.int16) * 24 + hours_since_epoch % 24, -1).astype(np.int16)
+
+    if "status" in df:
+        # Lower-case the handful of categories once, then test the integer codes
+        closed_codes = np.flatnonzero(df["status"].cat.categories.str.lower() == "closed")
+        df["is_closed"] = np.isin(df["status"].cat.codes.to_numpy(), closed_codes)
+
+    # Downcast numerics: hour fits in int8 and the charts don't need double precision
+    if "hour" in df:
+        df["hour"] = pd.to_numeric(df["hour"], downcast="integer")
+    for col in ["latitude", "longitude", "hours_to_close"]:
+        if col in df:
+            df[col] = df[col].astype("float32")
+    return df
+
+def read_with_feather_cache(fname):
+    # Reuse a Feather (Arrow IPC, zstd) copy of the prepared frame when it is at least
+    # as new as the CSV; otherwise parse the CSV once, derive the extra columns and
+    # write that copy, so warm starts are a plain read with no per-row work.
+    cache = fname.removesuffix(".gz").removesuffix(".csv") + f".v{CACHE_VERSION}.feather"
+    if os.path.exists(cache) and os.path.getmtime(cache) >= os.path.getmtime(fname):
+        try:
+            return pd.read_feather(cache)
+        except Exception:
+            pass  # unreadable cache (e.g. truncated): rebuild it from the CSV below
+
+    # Arrow's multithreaded reader inflates and parses in C++. Requested columns the
+    # file lacks come back as all-null and are dropped.
+    tbl = pacsv.read_csv(fname, convert_options=pacsv.ConvertOptions(
+        include_columns=LOAD_COLS, include_missing_columns=True,
+    ))
+    df = tbl.select([f.name for f in tbl.schema if not pa.types.is_null(f.type)]).to_pandas()
+    for c in ["created_date", "closed_date"]:
+        if c in df:
+            df[c] = pd.to_datetime(df[c], errors="coerce")
+
+    df = add_derived_columns(df)
+    # Write to a temp file beside the cache and swap it in, so an interrupted write
+    # never leaves a partial file that looks newer than the CSV
+    tmp = f"{cache}.{os.getpid()}.tmp"
+    try:
+        df.to_feather(tmp, compression="zstd", chunksize=64 * 1024)
+        os.replace(tmp, cache)
+    except Exception:
+        # e.g. read-only deploy: carry on without the cache
+        try:
+            os.remove(tmp)
+        except OSError:
+            pass
+    return df
+
+# cache_resource keeps one shared frame instead of unpickling a fresh copy on every
+# rerun; treat the returned DataFrame as read-only.
+@st.cache_resource(show_spinner=True)
 def load_data():
     # Try common filenames so you don't have to change code if you swap files
     for fname in ["nyc311_12months.csv.gz", "nyc311_12months.csv",
                   "nyc311_sample.csv.gz", "nyc311_sample.csv"]:
         try:
-            if fname.endswith(".gz"):
-                df = pd.read_csv(fname, compression="gzip", low_memory=False)
-            else:
-                df = pd.read_csv(fname, low_memory=False)
+            df = read_with_feather_cache(fname)
             source = fname
             break
-        except Exception:
+        except (OSError, pa.ArrowInvalid):
+            # Missing or unparseable file: try the next one. Anything else (e.g. a bug
+            # in add_derived_columns) should surface, not read as "no CSV found"
             df, source = None, None
     if df is None:
         raise FileNotFoundError(
             "No local CSV found. Place `nyc311_12months.csv.gz` (or a small sample) beside 311.py."
         )
+    return df, source
 
-    # Parse datetimes
-    for c in ["created_date", "closed_date"]:
-        if c in df:
-            df[c] = pd.to_datetime(df[c], errors="coerce")
-
-    # Derived fields
-    if {"created_date", "closed_date"}.issubset(df.columns):
-        df["hours_to_close"] = (df["closed_date"] - df["created_date"]).dt.total_seconds() / 3600
-
-    if "created_date" in df:
-        df["hour"] = df["created_date"].dt.hour
-        df["day_of_week"] = df["created_date"].dt.day_name()
+@st.cache_data(show_spinner=False)
+def load_clip_limits():
+    # 99th percentile of hours_to_close per complaint type, computed once per dataset
+    df, _ = load_data()
+    if not {"complaint_type", "hours_to_close"}.issubset(df.columns):
+        return pd.Series(dtype="float32")
+    codes = df["complaint_type"].cat.codes.to_numpy()
+    hrs = df["hours_to_close"].to_numpy().astype(np.float64)
+    keep = (codes >= 0) & ~np.isnan(hrs)
+    # A stable argsort of the small int codes is a radix sort, so grouping rows by
+    # type is O(N); each type's quantile is then an np.partition select, not a sort
+    order = np.argsort(codes[keep], kind="stable")
+    codes, hrs = codes[keep][order], hrs[keep][order]
+    bounds = np.searchsorted(codes, np.arange(len(df["complaint_type"].cat.categories) + 1))
+    present = np.flatnonzero(np.diff(bounds))
+    return pd.Series(
+        [np.quantile(hrs[bounds[i]:bounds[i + 1]], 0.99) for i in present],
+        index=df["complaint_type"].cat.categories[present],
+    )
 
-    # Normalize some columns we use a lot
-    for col in ["status", "complaint_type", "borough"]:
-        if col in df:
-            df[col] = df[col].fillna("Unspecified")
+# -------------------------------
+# Cached aggregations
+# -------------------------------
+# Each helper takes the filtered frame as `_df_f` (Streamlit does not hash
+# underscore args) and is keyed on the small filter_key tuple. Reruns that leave
+# the filters alone (e.g. moving the top-N slider) get the stored tiny result
+# instead of rescanning rows; the plotting itself stays uncached.
+def code_counts(s):
+    # value_counts for a categorical via bincount on its int codes: observed
+    # categories only, largest first (ties keep category order)
+    codes = s.cat.codes.to_numpy()
+    counts = np.bincount(codes[codes >= 0], minlength=len(s.cat.categories))
+    order = np.argsort(-counts, kind="stable")
+    order = order[counts[order] > 0]
+    return pd.Series(counts[order], index=s.cat.categories[order].rename(s.name), name="count")
+
+BOX_QUANTILES = np.array([0.25, 0.5, 0.75])
+
+def grouped_box_stats(s, values, upper_caps=None):
+    # Per-category box summary of `values` with one lexsort over (code, value). Each
+    # group is then a contiguous sorted slice, so every quartile (linear
+    # interpolation, like pandas) is an index lookup, with no per-group sort.
+    # `upper_caps` (one value per category) optionally pulls the upper whisker in;
+    # the quartiles always use every value.
+    codes = s.cat.codes.to_numpy()
+    values = np.asarray(values, dtype=np.float64)
+    keep = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[keep], values[keep]
+    order = np.lexsort((values, codes))
+    codes, values = codes[order], values[order]
+
+    bounds = np.searchsorted(codes, np.arange(len(s.cat.categories) + 1))
+    starts, sizes = bounds[:-1], np.diff(bounds)
+    present = np.flatnonzero(sizes)
+    pos = starts[present, None] + BOX_QUANTILES * (sizes[present, None] - 1)
+    lo = np.floor(pos).astype(np.int64)
+    hi = np.ceil(pos).astype(np.int64)
+    q1, median, q3 = (values[lo] + (values[hi] - values[lo]) * (pos - lo)).T
+
+    # Whiskers sit on the most extreme observation inside the 1.5×IQR fences, as
+    # px.box draws them; a searchsorted in each group's sorted slice finds it
+    iqr = q3 - q1
+    lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+    if upper_caps is not None:
+        # NaN caps leave the fence alone; a cap never pulls the whisker below q3
+        caps = np.asarray(upper_caps, dtype=np.float64)[present]
+        upper = np.maximum(np.fmin(upper, caps), q3)
+    lowerfence = np.empty(len(present))
+    upperfence = np.empty(len(present))
+    for j, i in enumerate(present):
+        group = values[bounds[i]:bounds[i + 1]]
+        lowerfence[j] = group[np.searchsorted(group, lower[j], side="left")]
+        upperfence[j] = group[np.searchsorted(group, upper[j], side="right") - 1]
+
+    return pd.DataFrame(
+        {0.25: q1, 0.5: median, 0.75: q3, "lowerfence": lowerfence, "upperfence": upperfence},
+        index=s.cat.categories[present],
+    )
 
-    return df, source
+@st.cache_data(show_spinner=False, max_entries=32)
+def agg_kpis(_df_f, filter_key):
+    # % closed, median hours to close and top complaint type straight from the
+    # underlying arrays in one cached call
+    pct_closed, median_hours, top_type = 0.0, np.nan, "—"
+    if not len(_df_f):
+        return pct_closed, median_hours, top_type
+
+    if "is_closed" in _df_f:
+        pct_closed = float(_df_f["is_closed"].to_numpy().mean() * 100)
+    if "hours_to_close" in _df_f:
+        hrs = _df_f["hours_to_close"].to_numpy()
+        hrs = hrs[~np.isnan(hrs)]
+        if hrs.size:
+            median_hours = float(np.median(hrs))
+    if "complaint_type" in _df_f:
+        # The cached type counts (shared with the top-N bar) are sorted: first entry is the mode
+        type_counts = agg_type_counts(_df_f, filter_key)
+        if len(type_counts):
+            top_type = type_counts.index[0]
+    return pct_closed, median_hours, top_type
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def agg_type_counts(_df_f, filter_key):
+    return code_counts(_df_f["complaint_type"])
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def agg_status_counts(_df_f, filter_key):
+    return code_counts(_df_f["status"])
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def agg_box_stats(_df_f, filter_key, n_types=20):
+    # Box summary per top complaint type, so Plotly gets five numbers per box, not
+    # every row. Quartiles/median use all values; only the upper whisker is capped
+    # at each type's precomputed 99th percentile so rare extremes don't stretch it.
+    top_types = agg_type_counts(_df_f, filter_key).head(n_types).index
+    q99_by_type = load_clip_limits()
+
+    # No row subset is copied: rows outside the top types are blanked by category
+    # code, which grouped_box_stats skips
+    types = _df_f["complaint_type"]
+    in_top = types.cat.categories.isin(top_types)
+    hrs = _df_f["hours_to_close"].to_numpy()
+    hrs = np.where(in_top[types.cat.codes.to_numpy()], hrs, np.nan)
+    caps = q99_by_type.reindex(types.cat.categories).to_numpy(dtype=np.float64)
+
+    return grouped_box_stats(types, hrs, upper_caps=caps).reindex(top_types).dropna()
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def agg_day_hour(_df_f, filter_key, hour_range=(0, 23)):
+    # 7×24 histogram from one bincount over the (weekday, hour) bins packed at load
+    bins = _df_f["dh_bin"].to_numpy()
+    grid = pd.DataFrame(
+        np.bincount(bins[bins >= 0], minlength=7 * 24).reshape(7, 24),
+        index=pd.CategoricalIndex(ORDER_DAYS, categories=ORDER_DAYS, ordered=True, name="day_of_week"),
+        columns=pd.RangeIndex(24, name="hour"),
+    )
+    # Keep only days that have requests (rows stay in weekday order), but every hour
+    # in the selected range: zero counts are data, and a gap in the numeric hour
+    # axis would stretch the neighbouring cells across it
+    return grid.loc[grid.sum(axis=1) > 0, hour_range[0]:hour_range[1]]
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def agg_hour_type_grid(_df_f, filter_key, n_types=6):
+    # Hour × type counts for the top types from one bincount over packed
+    # (hour, type code) bins; all hours 0–23 appear, even if no data
+    top_types = agg_type_counts(_df_f, filter_key).head(n_types).index
+    cats = _df_f["complaint_type"].cat.categories
+    n_cats = len(cats)
+    codes = _df_f["complaint_type"].cat.codes.to_numpy()
+    hours = _df_f["hour"].to_numpy()
+    keep = (codes >= 0) & (hours >= 0) & (hours < 24)
+    bins = hours[keep].astype(np.int64) * n_cats + codes[keep]
+    grid = np.bincount(bins, minlength=24 * n_cats).reshape(24, n_cats)
+    return pd.DataFrame(
+        grid[:, cats.get_indexer(top_types)],
+        index=pd.RangeIndex(24, name="hour"),
+        columns=top_types,
+    )
 
 df, source = load_data()
 st.success(f"Loaded data from `{source}`")
@@ -83,16 +326,39 @@ top_n = st.sidebar.slider("Top complaint types to show", 5, 30, 20)
 # -------------------------------
 # Apply filters
 # -------------------------------
-df_f = df.copy()
-
-if day_pick != "All" and "day_of_week" in df_f:
-    df_f = df_f[df_f["day_of_week"] == day_pick]
-
-if "hour" in df_f:
-    df_f = df_f[(df_f["hour"] >= hour_range[0]) & (df_f["hour"] <= hour_range[1])]
-
-if "All" not in boro_pick and "borough" in df_f:
-    df_f = df_f[df_f["borough"].isin(boro_pick)]
+@st.cache_data(show_spinner=False, max_entries=32)
+def filter_rows(day_pick, hour_range, boro_pick):
+    # Row positions matching the filters, cached per filter combination so reruns
+    # from other widgets skip the mask pass. Fuse all predicates into one boolean
+    # mask over the shared frame (no upfront copy).
+    df, _ = load_data()
+    mask = np.ones(len(df), dtype=bool)
+
+    if day_pick != "All" and "day_of_week" in df:
+        # Compare the int8 weekday codes against the picked day's code
+        mask &= df["day_of_week"].cat.codes.to_numpy() == ORDER_DAYS.index(day_pick)
+
+    if "hour" in df:
+        hours = df["hour"].to_numpy()
+        mask &= (hours >= hour_range[0]) & (hours <= hour_range[1])
+
+    if "All" not in boro_pick and "borough" in df:
+        # Compare int codes; get_indexer gives -1 for unknown labels, which must not match missing values
+        wanted = df["borough"].cat.categories.get_indexer(list(boro_pick))
+        mask &= np.isin(df["borough"].cat.codes.to_numpy(), wanted[wanted >= 0])
+
+    return np.flatnonzero(mask).astype(np.int32)
+
+# Small hashable signature of the active filters (used as a cache key)
+filter_key = (day_pick, hour_range, tuple(boro_pick))
+
+# Keep this session's filtered frame across reruns: widgets that don't change the
+# filters (e.g. the top-N slider) reuse it instead of gathering the rows again.
+# Keyed on the loaded frame itself, so clearing load_data's cache invalidates it
+if st.session_state.get("df_f_key") != (id(df), filter_key):
+    st.session_state["df_f"] = df.iloc[filter_rows(*filter_key)]
+    st.session_state["df_f_key"] = (id(df), filter_key)
+df_f = st.session_state["df_f"]
 
 # -------------------------------
 # KPI row
@@ -101,23 +367,11 @@ c1, c2, c3, c4 = st.columns(4)
 rows_after = len(df_f)
 c1.metric("Rows (after filters)", f"{rows_after:,}")
 
-if "status" in df_f:
-    pct_closed = df_f["status"].eq("Closed").mean() * 100 if rows_after else 0.0
-else:
-    pct_closed = 0.0
+pct_closed, median_hours, top_type = agg_kpis(df_f, filter_key)
 c2.metric("% Closed", f"{pct_closed:.1f}%")
-
-median_hours = df_f["hours_to_close"].median() if "hours_to_close" in df_f and rows_after else np.nan
 c3.metric("Median Hours to Close", "-" if np.isnan(median_hours) else f"{median_hours:.2f}")
-
-top_type = df_f["complaint_type"].mode()[0] if "complaint_type" in df_f and rows_after else "—"
 c4.metric("Top Complaint Type", top_type)
 
-# -------------------------------
-# Helper: warm palette
-# -------------------------------
-WARM = ["#8B0000","#B22222","#DC143C","#FF4500","#FF7F50","#FFA500","#FFB347","#FFD580"]
-
 # --------------------------------
 # TOP COMPLAINT TYPES (with narrative)
 # --------------------------------
@@ -126,8 +380,7 @@ st.caption("What issues are most frequently reported under the current filters?"
 
 if rows_after and "complaint_type" in df_f:
     counts = (
-        df_f["complaint_type"]
-        .value_counts()
+        agg_type_counts(df_f, filter_key)
         .head(top_n)
         .rename_axis("Complaint Type")
         .reset_index(name="Count")
@@ -171,9 +424,7 @@ st.caption("How are requests currently tracked (Closed, In Progress, etc.) under
 
 if rows_after and "status" in df_f:
     status_counts = (
-        df_f["status"]
-        .fillna("Unspecified")
-        .value_counts()
+        agg_status_counts(df_f, filter_key)
         .rename_axis("Status")
         .reset_index(name="Count")
     )
@@ -185,8 +436,6 @@ if rows_after and "status" in df_f:
             f"Overall closure rate is **{pct_closed:.1f}%**."
         )
 
-        status_counts = pd.DataFrame(status_counts.loc[:, ["Status", "Count"]])
-
         fig_pie = px.pie(
             status_counts, values="Count", names="Status",
             hole=0.5, color_discrete_sequence=px.colors.qualitative.Set3,
@@ -203,25 +452,24 @@ else:
 # RESOLUTION TIME BY TYPE (box) with narrative
 # --------------------------------
 st.subheader("⏱️ Resolution Time by Complaint Type")
-st.caption("Compare how long each type of complaint typically takes to resolve.")
+st.caption("Compare how long each type of complaint typically takes to resolve. "
+           "Whiskers follow the 1.5×IQR rule, capped at each type's 99th percentile.")
 
 if rows_after and {"complaint_type","hours_to_close"}.issubset(df_f.columns):
     # Keep chart readable: show the top 20 complaint types by count
-    top_for_box = (
-        df_f["complaint_type"]
-        .value_counts()
-        .head(20)
-        .index
-    )
-    df_box = df_f[df_f["complaint_type"].isin(top_for_box)]
-
-    fig_box = px.box(
-        df_box, x="complaint_type", y="hours_to_close",
-        color="complaint_type", points=False,
-        color_discrete_sequence=px.colors.qualitative.Set2,
-        title="Resolution Time (hours)"
-    )
+    box_stats = agg_box_stats(df_f, filter_key, n_types=20)
+
+    box_colors = px.colors.qualitative.Set2
+    fig_box = go.Figure()
+    for i, (ctype, s) in enumerate(box_stats.iterrows()):
+        fig_box.add_trace(go.Box(
+            x=[ctype], name=ctype,
+            q1=[s[0.25]], median=[s[0.5]], q3=[s[0.75]],
+            lowerfence=[s["lowerfence"]], upperfence=[s["upperfence"]],
+            marker_color=box_colors[i % len(box_colors)],
+        ))
     fig_box.update_layout(
+        title="Resolution Time (hours)",
         xaxis=dict(title=None, tickangle=45),
         yaxis_title="Hours to Close",
         showlegend=False,
@@ -230,12 +478,7 @@ if rows_after and {"complaint_type","hours_to_close"}.issubset(df_f.columns):
     st.plotly_chart(fig_box, use_container_width=True)
 
     # Narrative: slowest 3 by median
-    med = (
-        df_box.groupby("complaint_type")["hours_to_close"]
-        .median()
-        .sort_values(ascending=False)
-        .head(3)
-    )
+    med = box_stats[0.5].sort_values(ascending=False).head(3)
     if len(med) > 0:
         bullets = " • ".join([f"**{k}** (~{v:.1f}h)" for k, v in med.items()])
         st.markdown(f"**Narrative:** Slowest to resolve (median) → {bullets}.")
@@ -248,25 +491,17 @@ else:
 st.subheader("🔥 When are requests made?")
 st.caption("Heatmap showing request patterns by hour and day of week.")
 
-if rows_after and {"day_of_week","hour"}.issubset(df_f.columns):
-    order_days = ["Monday","Tuesday","Wednesday","Thursday","Friday","Saturday","Sunday"]
-    heat = (
-        df_f.groupby(["day_of_week","hour"])
-        .size()
-        .reset_index(name="Number of Requests")
-    )
-    # Keep weekday order
-    heat["day_of_week"] = pd.Categorical(heat["day_of_week"], categories=order_days, ordered=True)
-    heat = heat.sort_values(["day_of_week","hour"])
+if rows_after and "dh_bin" in df_f:
+    heat = agg_day_hour(df_f, filter_key, hour_range)
 
-    fig_heat = px.density_heatmap(
-        heat, x="hour", y="day_of_week", z="Number of Requests",
-        color_continuous_scale="YlOrRd", title="Requests by Hour and Day",
-    )
-    fig_heat.update_traces(
-        hovertemplate="Hour: %{x}:00<br>Day: %{y}<br>Requests: %{z}"
-    )
+    # The 7×24 grid goes to Plotly as-is: one cell per (day, hour), no re-binning
+    fig_heat = go.Figure(go.Heatmap(
+        z=heat.to_numpy(), x=heat.columns.tolist(), y=heat.index.astype(str).tolist(),
+        colorscale="YlOrRd", colorbar=dict(title="Requests"),
+        hovertemplate="Hour: %{x}:00<br>Day: %{y}<br>Requests: %{z}<extra></extra>",
+    ))
     fig_heat.update_layout(
+        title="Requests by Hour and Day",
         xaxis_title="Hour of Day (24h)",
         yaxis_title="Day of Week",
         title_font=dict(size=18),
@@ -274,11 +509,11 @@ if rows_after and {"day_of_week","hour"}.issubset(df_f.columns):
     st.plotly_chart(fig_heat, use_container_width=True)
 
     # Narrative: busiest cell
-    hot = heat.sort_values("Number of Requests", ascending=False).head(1)
-    if len(hot):
+    if heat.size:
+        day_i, hour_i = np.unravel_index(heat.to_numpy().argmax(), heat.shape)
         st.markdown(
-            f"**Narrative:** Busiest time is **{hot.iloc[0]['day_of_week']} {int(hot.iloc[0]['hour']):02d}:00** "
-            f"with **{int(hot.iloc[0]['Number of Requests']):,}** requests."
+            f"**Narrative:** Busiest time is **{heat.index[day_i]} {int(heat.columns[hour_i]):02d}:00** "
+            f"with **{int(heat.iat[day_i, hour_i]):,}** requests."
         )
 
 # --------------------------------
@@ -288,51 +523,56 @@ st.subheader("▶️ How do complaints evolve through the day?")
 st.caption("Press **Play** to watch requests change by hour (top categories shown for clarity).")
 
 if rows_after and {"hour", "complaint_type"}.issubset(df_f.columns):
-    # Ensure 0–23 always appear, even if no data
-    hours_full = pd.DataFrame({"hour": range(24)})
-
     # Focus animation on top 6 categories overall
-    top6 = df_f["complaint_type"].value_counts().head(6).index
-    df_anim = (
-        df_f[df_f["complaint_type"].isin(top6)]
-        .groupby(["hour", "complaint_type"])
-        .size()
-        .reset_index(name="Requests")
-    )
+    anim_grid = agg_hour_type_grid(df_f, filter_key, n_types=6)
 
-    # Merge to include missing hours (fill with 0)
-    df_anim = hours_full.merge(df_anim, on="hour", how="left").fillna({"Requests": 0})
-    df_anim["hour"] = df_anim["hour"].astype(int)
-    df_anim["complaint_type"].fillna("No Data", inplace=True)
-
-    # Sort hours properly (0–23)
-    df_anim = df_anim.sort_values("hour")
-
-    fig_anim = px.bar(
-        df_anim,
-        x="Requests", y="complaint_type",
-        color="complaint_type",
-        animation_frame="hour",
-        orientation="h",
-        range_x=[0, max(1, int(df_anim["Requests"].max() * 1.15))],
-        color_discrete_sequence=WARM,
-        category_orders={"hour": list(range(24))},
-        title="How requests evolve through the day (press ▶ to play)",
+    # Build the frames directly from the grid rather than letting px re-scan a long table
+    anim_types = list(anim_grid.columns)
+    anim_colors = [WARM[i % len(WARM)] for i in range(len(anim_types))]
+
+    def hour_bar(h):
+        return go.Bar(
+            x=anim_grid.loc[h].to_numpy(), y=anim_types,
+            orientation="h", marker_color=anim_colors,
+            hovertemplate="%{y}: %{x:,} requests<extra></extra>",
+        )
+
+    play_args = {"frame": {"duration": 500, "redraw": False}, "fromcurrent": True,
+                 "transition": {"duration": 500, "easing": "linear"}}
+    stop_args = {"frame": {"duration": 0, "redraw": False}, "mode": "immediate",
+                 "transition": {"duration": 0}}
+
+    fig_anim = go.Figure(
+        data=[hour_bar(0)],
+        frames=[go.Frame(data=[hour_bar(h)], name=str(h)) for h in range(24)],
     )
     fig_anim.update_layout(
+        title="How requests evolve through the day (press ▶ to play)",
         yaxis_title="Complaint Type",
-        xaxis_title="Requests (count)",
+        xaxis=dict(title="Requests (count)", range=[0, max(1, int(anim_grid.to_numpy().max() * 1.15))]),
         title_font=dict(size=18),
         showlegend=False,
-        updatemenus=[dict(type="buttons", showactive=False)],
+        updatemenus=[dict(
+            type="buttons", showactive=False, direction="left", x=0.1, y=0, xanchor="right", yanchor="top",
+            pad={"r": 10, "t": 70},
+            buttons=[
+                dict(label="▶", method="animate", args=[None, play_args]),
+                dict(label="◼", method="animate", args=[[None], stop_args]),
+            ],
+        )],
+        sliders=[dict(
+            active=0, x=0.1, len=0.9, y=0, xanchor="left", yanchor="top", pad={"b": 10, "t": 60},
+            currentvalue={"prefix": "hour="},
+            steps=[dict(label=str(h), method="animate", args=[[str(h)], stop_args]) for h in range(24)],
+        )],
     )
     st.plotly_chart(fig_anim, use_container_width=True)
 
     # Narrative
-    by_hour = df_anim.groupby("hour")["Requests"].sum().sort_values(ascending=False)
-    if len(by_hour):
+    by_hour = anim_grid.sum(axis=1)
+    if by_hour.any():
         st.markdown(
-            f"**Narrative:** Within the shown categories, peaks typically occur around **{int(by_hour.index[0])}:00**."
+            f"**Narrative:** Within the shown categories, peaks typically occur around **{int(by_hour.idxmax())}:00**."
         )
 
 # --------------------------------
@@ -341,23 +581,60 @@ if rows_after and {"hour", "complaint_type"}.issubset(df_f.columns):
 st.subheader("🗺️ Complaint Hotspots Across NYC")
 st.caption("Map shows sampled complaints. Dot color = status (see legend). Click or hover for details.")
 
-if rows_after and {"latitude","longitude"}.issubset(df_f.columns):
-    # Smaller sample for speed + smoother zoom
-    sample_n = min(800, len(df_f))
-    df_map = df_f.dropna(subset=["latitude","longitude"]).sample(sample_n, random_state=42)
-
-    # Simple status→color legend
-    status_colors = {
-        "Closed": "#2E7D32",          # green
-        "In Progress": "#1E88E5",     # blue
-        "Open": "#FB8C00",            # orange
-        "Assigned": "#8E24AA",        # purple
-        "Pending": "#F4511E",         # deep orange
-        "Started": "#3949AB",         # indigo
-        "Unspecified": "#9E9E9E",     # grey
-    }
-    def pick_color(s):
-        return status_colors.get(s, "#9E9E9E")
+MAP_COLS = ["latitude", "longitude", "complaint_type", "borough", "status",
+            "hours_to_close", "created_date"]
+
+@st.cache_data(show_spinner=False, max_entries=32)
+def build_map_html(_df_f, filter_key):
+    # The rendered map page for one filter combination: reruns that leave the
+    # filters alone reuse the HTML instead of rebuilding and re-serializing it.
+    # folium/branca/jinja2 are only imported once a map is actually drawn.
+    import folium
+    from folium.plugins import FastMarkerCluster, Fullscreen
+
+    # Smaller sample for speed + smoother zoom: pick row positions among geocoded rows
+    # instead of dropna-copying the whole filtered frame first
+    lat = _df_f["latitude"].to_numpy()
+    lon = _df_f["longitude"].to_numpy()
+    geo_idx = np.flatnonzero(~(np.isnan(lat) | np.isnan(lon)))
+    pick = np.random.default_rng(42).choice(geo_idx, size=min(800, geo_idx.size), replace=False)
+
+    # Keep one point per ~200 m grid cell; the rest would just overplot
+    cells = np.c_[np.round(lat[pick] * 500), np.round(lon[pick] * 500)].astype(np.int32)
+    _, first = np.unique(cells, axis=0, return_index=True)
+    # Gather only the columns the markers use, not the full-width rows
+    map_cols = _df_f.columns.get_indexer([c for c in MAP_COLS if c in _df_f])
+    df_map = _df_f.iloc[np.sort(pick[first]), map_cols]
+
+    # Per-row labels as whole arrays up front
+    def col_text(col, default):
+        if col in df_map:
+            return df_map[col].astype(str).to_numpy()
+        return np.full(len(df_map), default, dtype=object)
+
+    types = col_text("complaint_type", "(Unknown)")
+    boros = col_text("borough", "-")
+    statuses = col_text("status", "Unspecified")
+    colors = pd.Series(statuses).map(STATUS_COLORS).fillna("#9E9E9E").to_numpy()
+    if "hours_to_close" in df_map:
+        hrs = df_map["hours_to_close"].to_numpy()
+        hrs_txt = np.where(np.isnan(hrs), "N/A", np.char.mod("%.1f h", hrs))
+    else:
+        hrs_txt = np.full(len(df_map), "N/A", dtype=object)
+    if "created_date" in df_map:
+        created_txt = df_map["created_date"].dt.strftime("%Y-%m-%d %H:%M").fillna("").to_numpy()
+    else:
+        created_txt = np.full(len(df_map), "", dtype=object)
+
+    # Popup/tooltip text as whole-column string concatenation, not one f-string per row
+    labels = pd.DataFrame({"type": types, "borough": boros, "status": statuses,
+                           "hrs": hrs_txt, "created": created_txt}).astype(str)
+    popups = (
+        "<b>" + labels["type"] + "</b><br>Borough: " + labels["borough"]
+        + "<br>Status: " + labels["status"] + "<br>Hours to close: " + labels["hrs"]
+        + "<br>Created: " + labels["created"]
+    ).tolist()
+    tooltips = (labels["type"] + " — " + labels["status"] + " (" + labels["hrs"] + ")").tolist()
 
     # Build map (prefer_canvas for better performance)
     m = folium.Map(
@@ -370,47 +647,30 @@ if rows_after and {"latitude","longitude"}.issubset(df_f.columns):
     # Fullscreen button
     Fullscreen(position="topleft").add_to(m)
 
-    # Cluster with less work at very high zoom
-    cluster = MarkerCluster(disableClusteringAtZoom=15).add_to(m)
-
-    for _, r in df_map.iterrows():
-        status = r.get("status", "Unspecified")
-        color = pick_color(status)
-        hrs = r.get("hours_to_close", np.nan)
-        hrs_txt = "N/A" if pd.isna(hrs) else f"{hrs:.1f} h"
-        created = r.get("created_date", "")
-        created_txt = "" if pd.isna(created) else created.strftime("%Y-%m-%d %H:%M")
-
-        popup_html = folium.Popup(
-            folium.IFrame(
-                f"""
-                <b>{r.get('complaint_type','(Unknown)')}</b><br>
-                Borough: {r.get('borough','-')}<br>
-                Status: {status}<br>
-                Hours to close: {hrs_txt}<br>
-                Created: {created_txt}
-                """,
-                width=260, height=120
-            ),
-            max_width=260
-        )
-        tooltip = folium.Tooltip(
-            f"{r.get('complaint_type','(Unknown)')} — {status} ({hrs_txt})",
-            sticky=True
-        )
-        folium.CircleMarker(
-            location=[r["latitude"], r["longitude"]],
-            radius=4,
-            color=color,
-            fill=True,
-            fill_color=color,
-            fill_opacity=0.75,
-            tooltip=tooltip,
-            popup=popup_html
-        ).add_to(cluster)
-
-    # Add HTML legend
-    legend_html = """
+    # One JSON array of [lat, lon, color, popup, tooltip] rows; the markers are
+    # built in the browser by the callback instead of one folium object per row.
+    # Cluster with less work at very high zoom.
+    marker_js = """function (row) {
+        var marker = L.circleMarker(new L.LatLng(row[0], row[1]), {
+            radius: 4, color: row[2], fill: true, fillColor: row[2], fillOpacity: 0.75
+        });
+        marker.bindPopup(row[3], {maxWidth: 260});
+        marker.bindTooltip(row[4], {sticky: true});
+        return marker;
+    }"""
+    FastMarkerCluster(
+        list(zip(df_map["latitude"].tolist(), df_map["longitude"].tolist(),
+                 colors.tolist(), popups, tooltips)),
+        callback=marker_js,
+        disableClusteringAtZoom=15,
+    ).add_to(m)
+
+    # Add HTML legend (one swatch per entry in STATUS_COLORS)
+    legend_items = " &nbsp;\n        ".join(
+        f'<span style="display:inline-block;width:10px;height:10px;background:{c};border-radius:50%"></span> {s}'
+        for s, c in STATUS_COLORS.items()
+    )
+    legend_html = f"""
     <div style="
         position: fixed; 
         bottom: 30px; left: 30px; z-index: 9999;
@@ -419,20 +679,17 @@ if rows_after and {"latitude","longitude"}.issubset(df_f.columns):
         font-size: 13px;">
       <b>Legend — Status</b><br>
       <div style="margin-top:6px">
-        <span style="display:inline-block;width:10px;height:10px;background:#2E7D32;border-radius:50%"></span> Closed &nbsp;
-        <span style="display:inline-block;width:10px;height:10px;background:#1E88E5;border-radius:50%"></span> In Progress &nbsp;
-        <span style="display:inline-block;width:10px;height:10px;background:#FB8C00;border-radius:50%"></span> Open &nbsp;
-        <span style="display:inline-block;width:10px;height:10px;background:#8E24AA;border-radius:50%"></span> Assigned &nbsp;
-        <span style="display:inline-block;width:10px;height:10px;background:#F4511E;border-radius:50%"></span> Pending &nbsp;
-        <span style="display:inline-block;width:10px;height:10px;background:#3949AB;border-radius:50%"></span> Started &nbsp;
-        <span style="display:inline-block;width:10px;height:10px;background:#9E9E9E;border-radius:50%"></span> Unspecified
+        {legend_items}
       </div>
     </div>
     """
     m.get_root().html.add_child(folium.Element(legend_html))
 
-    # Bigger map, full width
-    st_folium(m, use_container_width=True, height=700)
+    return m.get_root().render()
+
+if rows_after and {"latitude","longitude"}.issubset(df_f.columns):
+    # Bigger map, full width; a static iframe, since no click data is read back
+    st.iframe(build_map_html(df_f, filter_key), height=700)
 else:
     st.info("No latitude/longitude columns in the dataset (or no rows after filters).")
 